@@ -1,10 +1,224 @@
 """
 Aggregate, deduplicate, and score findings from multiple analyzers
 """
-from typing import List, Dict, Any
-from collections import defaultdict
+import random
+import zlib
+from bisect import bisect_right
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Dict, Any, FrozenSet, Set, Tuple
+from collections import Counter, defaultdict
+from itertools import chain
+from operator import attrgetter
+import numpy as np
 from models.schemas import RedFlag, SeverityLevel, AnalysisResult
-from datetime import datetime
+from datetime import datetime, timezone
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; without it every category uses LSH
+    njit = None
+
+
+# Sort rank and risk-score weight per severity (shared, never mutated)
+_SEVERITY_ORDER = MappingProxyType({
+    SeverityLevel.CRITICAL: 0,
+    SeverityLevel.HIGH: 1,
+    SeverityLevel.MEDIUM: 2,
+    SeverityLevel.LOW: 3
+})
+_SEVERITY_WEIGHTS = MappingProxyType({
+    SeverityLevel.CRITICAL: 10,
+    SeverityLevel.HIGH: 5,
+    SeverityLevel.MEDIUM: 2,
+    SeverityLevel.LOW: 1
+})
+_EMPTY_COUNTS = MappingProxyType({severity: 0 for severity in _SEVERITY_ORDER})
+
+# Above this many flags severity totals are computed with NumPy; below it
+# the array setup costs more than the plain Python loop
+_NUMPY_MIN_FLAGS = 1000
+_SEVERITIES = tuple(_SEVERITY_ORDER)
+_WEIGHTS_BY_INDEX = np.array([_SEVERITY_WEIGHTS[s] for s in _SEVERITIES], dtype=np.int64)
+
+# Risk level bins: a score >= _RISK_THRESHOLDS[i] maps to _RISK_LEVELS[i + 1]
+_RISK_THRESHOLDS = (2, 4, 6, 8)
+_RISK_LEVELS = ("MINIMAL RISK", "LOW RISK", "MODERATE RISK", "HIGH RISK", "EXTREME RISK")
+
+# MinHash-LSH parameters: 64 permutations split into 16 bands of 4 rows.
+# Candidate pairs collide with probability 1 - (1 - s^4)^16, i.e. ~0.5 at
+# Jaccard 0.5 and >0.97 at the 0.7 dedup threshold. LSH thus trades a
+# little recall for speed: about 1 in 80 pairs right at the threshold is
+# never compared and both flags are kept, so it only serves categories
+# too large for the exact pass and too small (or Numba missing) for the kernel.
+_NUM_PERM = 64
+_LSH_BANDS = 16
+_LSH_ROWS = 4
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures (and therefore dedup results) are reproducible
+_rng = random.Random(42)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(_NUM_PERM)
+]
+
+
+def _minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    """Compute a MinHash signature for a non-empty token set"""
+    hashes = [zlib.crc32(token.encode()) for token in tokens]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+class _MinHashLSH:
+    """Banded LSH index so each lookup is O(bands) instead of O(seen flags)"""
+    
+    def __init__(self, bands: int = _LSH_BANDS, rows: int = _LSH_ROWS):
+        self.rows = rows
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [
+            defaultdict(list) for _ in range(bands)
+        ]
+    
+    def _bands(self, signature: Tuple[int, ...]):
+        for i, buckets in enumerate(self._buckets):
+            yield buckets, signature[i * self.rows:(i + 1) * self.rows]
+    
+    def insert(self, key: int, signature: Tuple[int, ...]):
+        """Index a signature under the given key"""
+        for buckets, band in self._bands(signature):
+            buckets[band].append(key)
+    
+    def query(self, signature: Tuple[int, ...]) -> Set[int]:
+        """Return keys sharing at least one band with the signature"""
+        candidates: Set[int] = set()
+        for buckets, band in self._bands(signature):
+            candidates.update(buckets.get(band, ()))
+        return candidates
+
+
+@lru_cache(maxsize=8192)
+def _flag_words(title: str, description_head: str) -> FrozenSet[str]:
+    """Case-folded word set for a flag title and description prefix"""
+    return frozenset(f"{title} {description_head}".casefold().split())
+
+
+@lru_cache(maxsize=4096)
+def _cached_jaccard(words1: FrozenSet[str], words2: FrozenSet[str]) -> float:
+    overlap = len(words1 & words2)
+    return overlap / (len(words1) + len(words2) - overlap)
+
+
+def _jaccard(words1: FrozenSet[str], words2: FrozenSet[str]) -> float:
+    """
+    Jaccard similarity of two non-empty word sets, memoized
+    
+    Arguments are ordered by hash so (a, b) and (b, a) share a cache slot;
+    the cache persists across aggregate calls, so flags repeated across
+    documents in a batch are only compared once.
+    """
+    if hash(words1) > hash(words2):
+        words1, words2 = words2, words1
+    return _cached_jaccard(words1, words2)
+
+
+# Below this many flags a category compares every kept pair exactly; the
+# MinHash signatures cost more than the comparisons they avoid
+_LSH_MIN_FLAGS = 400
+
+# Categories with at least this many flags are deduplicated by the compiled
+# kernel (when Numba is installed) instead of the MinHash-LSH loop
+_NUMBA_MIN_FLAGS = 2000
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _greedy_dedup_kernel(offsets, tokens, threshold):
+        """
+        Greedy first-wins dedup over sorted int32 token ids (CSR layout)
+        
+        Flag i's ids are tokens[offsets[i]:offsets[i + 1]]. A flag is kept
+        unless its Jaccard similarity with an already kept flag reaches the
+        threshold; the comparisons against kept flags run in parallel.
+        """
+        n = len(offsets) - 1
+        keep = np.zeros(n, dtype=np.bool_)
+        kept = np.empty(n, dtype=np.int64)
+        n_kept = 0
+        
+        for i in range(n):
+            start_i = offsets[i]
+            end_i = offsets[i + 1]
+            len_i = end_i - start_i
+            if len_i == 0:
+                keep[i] = True  # No words, never similar to anything
+                continue
+            
+            hits = 0
+            for k in prange(n_kept):
+                j = kept[k]
+                a = start_i
+                b = offsets[j]
+                end_j = offsets[j + 1]
+                len_j = end_j - b
+                overlap = 0
+                while a < end_i and b < end_j:
+                    if tokens[a] == tokens[b]:
+                        overlap += 1
+                        a += 1
+                        b += 1
+                    elif tokens[a] < tokens[b]:
+                        a += 1
+                    else:
+                        b += 1
+                if overlap / (len_i + len_j - overlap) >= threshold:
+                    hits += 1
+            
+            if hits == 0:
+                keep[i] = True
+                kept[n_kept] = i
+                n_kept += 1
+        
+        return keep
+else:
+    _greedy_dedup_kernel = None
+
+
+def _numba_keep_mask(token_sets: List[FrozenSet[str]], threshold: float) -> np.ndarray:
+    """Map word sets to sorted integer ids and run the compiled dedup kernel"""
+    vocab: Dict[str, int] = {}
+    id_lists = [sorted(vocab.setdefault(t, len(vocab)) for t in tokens) for tokens in token_sets]
+    
+    offsets = np.zeros(len(id_lists) + 1, dtype=np.int64)
+    np.cumsum([len(ids) for ids in id_lists], out=offsets[1:])
+    flat = np.fromiter(chain.from_iterable(id_lists), dtype=np.int32, count=int(offsets[-1]))
+    
+    return _greedy_dedup_kernel(offsets, flat, threshold)
+
+
+def _severity_totals(flags: List[RedFlag]) -> Tuple[Dict[SeverityLevel, int], int, int]:
+    """Return (counts per severity, weighted score sum, total weight) in one pass"""
+    if len(flags) >= _NUMPY_MIN_FLAGS:
+        n = len(flags)
+        severity_idx = np.fromiter((_SEVERITY_ORDER[f.severity] for f in flags), dtype=np.intp, count=n)
+        scores = np.fromiter((f.score for f in flags), dtype=np.int64, count=n)
+        weights = _WEIGHTS_BY_INDEX[severity_idx]
+        bins = np.bincount(severity_idx, minlength=len(_SEVERITIES))
+        counts = dict(zip(_SEVERITIES, bins.tolist()))
+        return counts, int(scores @ weights), int(weights.sum())
+    
+    counts = dict(_EMPTY_COUNTS)
+    weighted_sum = 0
+    total_weight = 0
+    for flag in flags:
+        severity = flag.severity
+        weight = _SEVERITY_WEIGHTS[severity]
+        counts[severity] += 1
+        weighted_sum += flag.score * weight
+        total_weight += weight
+    return counts, weighted_sum, total_weight
 
 
 class ResultAggregator:
@@ -39,23 +253,17 @@ class ResultAggregator:
         deduplicated = self._deduplicate_flags(all_flags)
         
         # Sort by severity then score
-        severity_order = {
-            SeverityLevel.CRITICAL: 0,
-            SeverityLevel.HIGH: 1,
-            SeverityLevel.MEDIUM: 2,
-            SeverityLevel.LOW: 3
-        }
-        deduplicated.sort(key=lambda f: (severity_order[f.severity], -f.score))
+        deduplicated.sort(key=lambda f: (_SEVERITY_ORDER[f.severity], -f.score))
         
-        # Calculate counts
-        severity_counts = self._count_by_severity(deduplicated)
+        # Count by severity and accumulate the weighted risk in one pass
+        severity_counts, weighted_sum, total_weight = _severity_totals(deduplicated)
         
-        # Calculate overall risk score (weighted average)
-        risk_score = self._calculate_risk_score(deduplicated)
+        # Overall risk score (weighted average)
+        risk_score = round(weighted_sum / total_weight, 2) if total_weight else 0.0
         
         return AnalysisResult(
             document_name=document_name,
-            analyzed_at=datetime.now(),
+            analyzed_at=datetime.now(timezone.utc),
             total_flags=len(deduplicated),
             critical_count=severity_counts[SeverityLevel.CRITICAL],
             high_count=severity_counts[SeverityLevel.HIGH],
@@ -77,7 +285,10 @@ class ResultAggregator:
         
         Strategy:
         1. Group by category
-        2. Within category, find similar titles/descriptions
+        2. Within category, find similar titles/descriptions by exact
+           Jaccard similarity; mid-sized categories only compare MinHash-LSH
+           candidates, which can miss ~1% of pairs near the threshold, and
+           very large ones use an exact compiled kernel when Numba is available
         3. Keep the one with highest confidence (rule > claude > gpt)
         """
         if not flags:
@@ -91,57 +302,66 @@ class ResultAggregator:
         deduplicated = []
         
         for category, category_flags in by_category.items():
-            seen_similar = set()
+            lsh = _MinHashLSH()
+            seen_keys: List[FrozenSet[str]] = []
+            threshold = self.similarity_threshold
             
-            for flag in category_flags:
-                # Check if similar to any already added
-                is_duplicate = False
-                flag_key = self._get_flag_key(flag)
+            # Tokenize each flag exactly once
+            keyed = [(flag, self._get_flag_key(flag)) for flag in category_flags]
+            
+            if _greedy_dedup_kernel is not None and len(keyed) >= _NUMBA_MIN_FLAGS:
+                keep = _numba_keep_mask([tokens for _, tokens in keyed], threshold)
+                deduplicated.extend(flag for (flag, _), kept in zip(keyed, keep) if kept)
+                continue
+            
+            if len(keyed) < _LSH_MIN_FLAGS:
+                # Same first-wins result as the kernel, without the index
+                for flag, tokens in keyed:
+                    if tokens and any(_jaccard(tokens, kept) >= threshold for kept in seen_keys):
+                        continue
+                    deduplicated.append(flag)
+                    if tokens:
+                        seen_keys.append(tokens)
+                continue
+            
+            for flag, tokens in keyed:
+                # Flags without words can never match, so they skip the index
+                if not tokens:
+                    deduplicated.append(flag)
+                    continue
                 
-                for seen_key in seen_similar:
-                    if self._are_similar(flag_key, seen_key):
+                # Only compare against flags sharing an LSH band
+                signature = _minhash(tokens)
+                is_duplicate = False
+                for i in lsh.query(signature):
+                    if _jaccard(tokens, seen_keys[i]) >= threshold:
                         is_duplicate = True
                         break
                 
                 if not is_duplicate:
                     deduplicated.append(flag)
-                    seen_similar.add(flag_key)
+                    lsh.insert(len(seen_keys), signature)
+                    seen_keys.append(tokens)
         
         return deduplicated
     
-    def _get_flag_key(self, flag: RedFlag) -> str:
-        """Generate a key for similarity comparison"""
-        # Use title and first 100 chars of description
-        return f"{flag.title.lower()}|{flag.description[:100].lower()}"
+    def _get_flag_key(self, flag: RedFlag) -> FrozenSet[str]:
+        """Generate the word set used for similarity comparison"""
+        # Use title and first 100 chars of description; repeated flags reuse
+        # the cached set (and its cached hash) instead of re-folding the text
+        return _flag_words(flag.title, flag.description[:100])
     
-    def _are_similar(self, key1: str, key2: str) -> bool:
-        """Check if two flag keys are similar (simple approach)"""
-        # Simple word overlap check
-        words1 = set(key1.split())
-        words2 = set(key2.split())
-        
+    def _are_similar(self, words1: FrozenSet[str], words2: FrozenSet[str]) -> bool:
+        """Check if two flag word sets are similar (Jaccard overlap)"""
         if not words1 or not words2:
             return False
         
-        overlap = len(words1 & words2)
-        union = len(words1 | words2)
-        
-        similarity = overlap / union if union > 0 else 0
-        return similarity >= self.similarity_threshold
+        return _jaccard(words1, words2) >= self.similarity_threshold
     
     def _count_by_severity(self, flags: List[RedFlag]) -> Dict[SeverityLevel, int]:
         """Count flags by severity level"""
-        counts = {
-            SeverityLevel.CRITICAL: 0,
-            SeverityLevel.HIGH: 0,
-            SeverityLevel.MEDIUM: 0,
-            SeverityLevel.LOW: 0
-        }
-        
-        for flag in flags:
-            counts[flag.severity] += 1
-        
-        return counts
+        counts = Counter(map(attrgetter("severity"), flags))
+        return {severity: counts[severity] for severity in _SEVERITIES}
     
     def _calculate_risk_score(self, flags: List[RedFlag]) -> float:
         """
@@ -156,20 +376,7 @@ class ResultAggregator:
         if not flags:
             return 0.0
         
-        severity_weights = {
-            SeverityLevel.CRITICAL: 10,
-            SeverityLevel.HIGH: 5,
-            SeverityLevel.MEDIUM: 2,
-            SeverityLevel.LOW: 1
-        }
-        
-        weighted_sum = 0
-        total_weight = 0
-        
-        for flag in flags:
-            weight = severity_weights[flag.severity]
-            weighted_sum += flag.score * weight
-            total_weight += weight
+        _, weighted_sum, total_weight = _severity_totals(flags)
         
         if total_weight == 0:
             return 0.0
@@ -183,7 +390,7 @@ class ResultAggregator:
         summary = f"""
 === M&A DUE DILIGENCE ANALYSIS ===
 Document: {result.document_name}
-Analyzed: {result.analyzed_at.strftime('%Y-%m-%d %H:%M:%S')}
+Analyzed: {result.analyzed_at.strftime('%Y-%m-%d %H:%M:%S %Z')}
 Processing Time: {result.processing_time_seconds}s
 
 OVERALL RISK: {risk_level} ({result.overall_risk_score}/10)
@@ -208,13 +415,4 @@ FINDINGS SUMMARY:
     
     def _get_risk_level(self, score: float) -> str:
         """Convert numeric score to risk level"""
-        if score >= 8:
-            return "EXTREME RISK"
-        elif score >= 6:
-            return "HIGH RISK"
-        elif score >= 4:
-            return "MODERATE RISK"
-        elif score >= 2:
-            return "LOW RISK"
-        else:
-            return "MINIMAL RISK"
\ No newline at end of file
+        return _RISK_LEVELS[bisect_right(_RISK_THRESHOLDS, score)]
\ No newline at end of file
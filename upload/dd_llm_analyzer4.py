@@ -2,17 +2,37 @@
 LLM-based semantic analysis using Claude and GPT
 """
 import asyncio
-import json
-from typing import List, Dict, Any, Optional
-from anthropic import Anthropic
-from openai import OpenAI
+import hashlib
+from typing import List, Dict, Any, Optional, Awaitable, Callable
+from anthropic import AsyncAnthropic
+import orjson
+from diskcache import Cache
+from openai import AsyncOpenAI
 from models.schemas import RedFlag, SeverityLevel, FlagCategory
 from utils.config import get_settings
 
 
+def _strip_code_fences(response_text: str) -> str:
+    """Remove optional ```json / ``` fences around the payload (LLMs often add markdown)"""
+    # Anchored prefix/suffix checks stay linear on long whitespace runs,
+    # which a single optional-fence regex backtracks over
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
 class LLMAnalyzer:
     """Semantic analysis using Claude and GPT-4"""
     
+    CACHE_TTL_SECONDS = 7 * 24 * 3600  # Reuse LLM responses for a week
+    MAX_CONCURRENT_CALLS = 8  # In-flight chunk requests per provider (rate limits)
+    CACHE_DIR = "/tmp/dd_llm_cache"  # diskcache directory for LLM responses
+    
     ANALYSIS_PROMPT = """You are an expert M&A attorney reviewing a contract section for red flags.
 
 Analyze the following contract section and identify any red flags related to:
@@ -41,11 +61,26 @@ Contract section:
 
 JSON response:"""
     
+    # Split once at class load; prompts are built by concatenation, not str.format
+    _PROMPT_PREFIX, _PROMPT_SUFFIX = ANALYSIS_PROMPT.split("{text}")
+    
     def __init__(self):
         settings = get_settings()
-        self.claude_client = Anthropic(api_key=settings.anthropic_api_key)
-        self.openai_client = OpenAI(api_key=settings.openai_api_key)
+        self.claude_client = AsyncAnthropic(api_key=settings.anthropic_api_key)
+        self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.settings = settings
+        
+        # Per-provider cap on in-flight chunk requests
+        self._claude_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_CALLS)
+        self._gpt_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_CALLS)
+        
+        # Raw LLM responses keyed by (model, prompt) so repeated sections skip
+        # the API; the cache only saves calls, so without it analysis still runs
+        try:
+            self.response_cache: Optional[Cache] = Cache(self.CACHE_DIR)
+        except Exception as e:
+            print(f"LLM response cache unavailable, running uncached: {e}")
+            self.response_cache = None
     
     async def analyze(self, text: str, use_claude: bool = True, use_gpt: bool = True) -> List[RedFlag]:
         """
@@ -88,68 +123,170 @@ JSON response:"""
         try:
             # Chunk text if too long (max ~100k tokens for Sonnet)
             chunks = self._chunk_text(text, max_chars=50000)
-            all_flags = []
+            return await self._analyze_chunks(
+                chunks, self._analyze_chunk_with_claude, self._claude_semaphore, "Claude"
+            )
             
-            for chunk in chunks:
-                prompt = self.ANALYSIS_PROMPT.format(text=chunk)
-                
-                message = self.claude_client.messages.create(
-                    model=self.settings.claude_model,
-                    max_tokens=self.settings.max_tokens,
-                    temperature=self.settings.temperature,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                
-                # Parse response
-                response_text = response.choices[0].message.content
-                flags = self._parse_llm_response(response_text, source="gpt4")
-                all_flags.extend(flags)
-            
-            return all_flags
+        except Exception as e:
+            print(f"Claude analysis failed: {e}")
+            return []
+    
+    async def _analyze_with_gpt(self, text: str) -> List[RedFlag]:
+        """Analyze with GPT-4"""
+        try:
+            chunks = self._chunk_text(text, max_chars=50000)
+            return await self._analyze_chunks(
+                chunks, self._analyze_chunk_with_gpt, self._gpt_semaphore, "GPT"
+            )
             
         except Exception as e:
             print(f"GPT analysis failed: {e}")
             return []
     
+    async def _analyze_chunk_with_claude(self, chunk: str) -> List[RedFlag]:
+        """Send a single chunk to Claude"""
+        prompt = self._PROMPT_PREFIX + chunk + self._PROMPT_SUFFIX
+        model = self.settings.claude_model
+        cache_key = self._cache_key(model, prompt)
+        
+        # diskcache is blocking sqlite I/O, so it stays off the event loop
+        response_text = await asyncio.to_thread(self._cache_get, cache_key)
+        if response_text is not None:
+            return self._parse_llm_response(response_text, source="claude") or []
+        
+        message = await self.claude_client.messages.create(
+            model=model,
+            max_tokens=self.settings.max_tokens,
+            temperature=self.settings.temperature,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        response_text = message.content[0].text
+        
+        # Parse response; only a reply that parses is cached, so a bad one is retried
+        flags = self._parse_llm_response(response_text, source="claude")
+        if flags is None:
+            return []
+        await asyncio.to_thread(self._cache_set, cache_key, response_text)
+        return flags
+    
+    async def _analyze_chunk_with_gpt(self, chunk: str) -> List[RedFlag]:
+        """Send a single chunk to GPT-4"""
+        prompt = self._PROMPT_PREFIX + chunk + self._PROMPT_SUFFIX
+        model = self.settings.gpt_model
+        cache_key = self._cache_key(model, prompt)
+        
+        response_text = await asyncio.to_thread(self._cache_get, cache_key)
+        if response_text is not None:
+            return self._parse_llm_response(response_text, source="gpt4") or []
+        
+        response = await self.openai_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.settings.temperature,
+            response_format={"type": "json_object"}
+        )
+        response_text = response.choices[0].message.content
+        
+        flags = self._parse_llm_response(response_text, source="gpt4")
+        if flags is None:
+            return []
+        await asyncio.to_thread(self._cache_set, cache_key, response_text)
+        return flags
+    
+    def _cache_get(self, cache_key: str) -> Optional[str]:
+        """Cached reply for a request, or None; a cache error counts as a miss"""
+        if self.response_cache is None:
+            return None
+        try:
+            return self.response_cache.get(cache_key)
+        except Exception as e:
+            print(f"LLM response cache read failed: {e}")
+            return None
+    
+    def _cache_set(self, cache_key: str, response_text: str) -> None:
+        """Store a parsed reply; a cache error only loses the reuse"""
+        if self.response_cache is None:
+            return
+        try:
+            self.response_cache.set(cache_key, response_text, expire=self.CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"LLM response cache write failed: {e}")
+    
+    def _cache_key(self, model: str, prompt: str) -> str:
+        """Content hash identifying an LLM request, including the sampling settings"""
+        settings = self.settings
+        request = f"{model}|{settings.temperature}|{settings.max_tokens}|{prompt}"
+        return hashlib.blake2b(request.encode(), digest_size=16).hexdigest()
+    
+    async def _analyze_chunks(
+        self,
+        chunks: List[str],
+        analyze_chunk: Callable[[str], Awaitable[List[RedFlag]]],
+        semaphore: asyncio.Semaphore,
+        provider: str
+    ) -> List[RedFlag]:
+        """
+        Run one provider over all chunks concurrently
+        
+        Wall time is the slowest chunk instead of the sum of all chunks.
+        A failed chunk is logged and skipped so the others still count.
+        Identical chunks (repeated riders, boilerplate appendices) are sent
+        once, since a repeat could only produce duplicate flags.
+        """
+        async def run(chunk: str) -> List[RedFlag]:
+            async with semaphore:
+                return await analyze_chunk(chunk)
+        
+        unique_chunks = dict.fromkeys(chunks)
+        results = await asyncio.gather(*(run(chunk) for chunk in unique_chunks), return_exceptions=True)
+        
+        all_flags = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"{provider} chunk analysis failed: {result}")
+                continue
+            all_flags.extend(result)
+        
+        return all_flags
+    
     def _chunk_text(self, text: str, max_chars: int = 50000) -> List[str]:
         """Split text into manageable chunks"""
         if len(text) <= max_chars:
             return [text]
         
         chunks = []
-        current_chunk = ""
+        current_parts: List[str] = []
+        current_len = 0
         
-        # Split by paragraphs to avoid breaking mid-sentence
+        # Split by paragraphs to avoid breaking mid-sentence; parts are joined
+        # once per chunk instead of growing a string paragraph by paragraph
         paragraphs = text.split('\n\n')
         
         for para in paragraphs:
-            if len(current_chunk) + len(para) > max_chars:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = para
+            if not current_len:
+                current_parts = [para]
+                current_len = len(para)
+            elif current_len + 2 + len(para) > max_chars:
+                chunks.append('\n\n'.join(current_parts))
+                current_parts = [para]
+                current_len = len(para)
             else:
-                current_chunk += "\n\n" + para if current_chunk else para
+                current_parts.append(para)
+                current_len += 2 + len(para)
         
-        if current_chunk:
-            chunks.append(current_chunk)
+        if current_len:
+            chunks.append('\n\n'.join(current_parts))
         
         return chunks
     
-    def _parse_llm_response(self, response_text: str, source: str) -> List[RedFlag]:
-        """Parse JSON response from LLM into RedFlag objects"""
+    def _parse_llm_response(self, response_text: str, source: str) -> Optional[List[RedFlag]]:
+        """Parse JSON response from LLM into RedFlag objects (None if the reply is unusable)"""
         try:
             # Clean response (sometimes LLMs wrap JSON in markdown)
-            response_text = response_text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
+            response_text = _strip_code_fences(response_text)
             
             # Parse JSON
-            data = json.loads(response_text)
+            data = orjson.loads(response_text)
             
             # Handle both array and object with "flags" key
             if isinstance(data, dict) and "flags" in data:
@@ -157,7 +294,7 @@ JSON response:"""
             
             if not isinstance(data, list):
                 print(f"Unexpected response format from {source}: {type(data)}")
-                return []
+                return None
             
             flags = []
             for item in data:
@@ -180,43 +317,17 @@ JSON response:"""
             
             return flags
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"Failed to parse JSON from {source}: {e}")
             print(f"Response was: {response_text[:500]}")
-            return []
+            return None
         except Exception as e:
             print(f"Error parsing {source} response: {e}")
-            return []
+            return None
 
 
 # Sync wrapper for backward compatibility
 def analyze_with_llm(text: str, use_claude: bool = True, use_gpt: bool = True) -> List[RedFlag]:
     """Synchronous wrapper for LLM analysis"""
     analyzer = LLMAnalyzer()
-    return asyncio.run(analyzer.analyze(text, use_claude, use_gpt))text = message.content[0].text
-                flags = self._parse_llm_response(response_text, source="claude")
-                all_flags.extend(flags)
-            
-            return all_flags
-            
-        except Exception as e:
-            print(f"Claude analysis failed: {e}")
-            return []
-    
-    async def _analyze_with_gpt(self, text: str) -> List[RedFlag]:
-        """Analyze with GPT-4"""
-        try:
-            chunks = self._chunk_text(text, max_chars=50000)
-            all_flags = []
-            
-            for chunk in chunks:
-                prompt = self.ANALYSIS_PROMPT.format(text=chunk)
-                
-                response = self.openai_client.chat.completions.create(
-                    model=self.settings.gpt_model,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=self.settings.temperature,
-                    response_format={"type": "json_object"}
-                )
-                
-                response_
\ No newline at end of file
+    return asyncio.run(analyzer.analyze(text, use_claude, use_gpt))
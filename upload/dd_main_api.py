@@ -1,15 +1,19 @@
 """
 FastAPI application for M&A Due Diligence Analyzer
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import tempfile
+import multiprocessing
 import os
 import time
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import List, Optional
 
-from models.schemas import AnalysisResult, HealthResponse
+from models.schemas import AnalysisResult, HealthResponse, RedFlag
 from parsers.pdf_parser import PDFParser
 from analyzers.rule_engine import RuleEngine
 from analyzers.llm_analyzer import LLMAnalyzer
@@ -18,11 +22,16 @@ from utils.config import get_settings
 import asyncio
 
 
+UPLOAD_CHUNK_SIZE = 1 << 20  # Copy uploads to disk 1MB at a time
+BATCH_CONCURRENCY = 4  # Batch files analyzed at once (LLM provider rate limits)
+RULE_WORKERS = os.cpu_count()  # Rule engine worker processes
+
 # Initialize FastAPI app
 app = FastAPI(
     title="M&A Due Diligence Analyzer",
     description="AI-powered red flag detection for M&A contracts",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware (adjust origins in production)
@@ -35,6 +44,85 @@ app.add_middleware(
 )
 
 
+# Analysis components are built once and reused across requests so the
+# LLM clients keep their connection pools (no TLS handshake per upload)
+@lru_cache()
+def get_pdf_parser() -> PDFParser:
+    return PDFParser()
+
+
+# PyMuPDF does not support multithreading, so every parse, from any request
+# or batch item, runs on this one thread and PDFs are parsed one at a time
+@lru_cache()
+def get_parse_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-parse")
+
+
+@lru_cache()
+def get_rule_engine() -> RuleEngine:
+    return RuleEngine()
+
+
+@lru_cache()
+def get_llm_analyzer() -> LLMAnalyzer:
+    return LLMAnalyzer()
+
+
+@lru_cache()
+def get_aggregator() -> ResultAggregator:
+    return ResultAggregator()
+
+
+# Regex-heavy rule checks hold the GIL, so they run in worker processes.
+# Forking a process that already runs the event loop and the LLM clients'
+# threads can deadlock the child, so workers start from a clean interpreter.
+# Each worker keeps its own rule engine result cache, so a repeat upload
+# only hits it when the same worker picks up the job.
+@lru_cache()
+def get_rule_pool() -> ProcessPoolExecutor:
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(
+        max_workers=RULE_WORKERS,
+        mp_context=multiprocessing.get_context(start_method)
+    )
+
+
+def _run_rule_engine(full_text: str) -> List[RedFlag]:
+    """Rule engine entry point for worker processes (one engine per worker)"""
+    return get_rule_engine().analyze(full_text)
+
+
+async def _run_rules_in_pool(full_text: str) -> List[RedFlag]:
+    """Run the rule engine in the worker pool, replacing the pool once if it broke"""
+    loop = asyncio.get_running_loop()
+    pool = get_rule_pool()
+    try:
+        return await loop.run_in_executor(pool, _run_rule_engine, full_text)
+    except BrokenProcessPool:
+        # A worker that dies (e.g. OOM on a huge filing) breaks the pool for
+        # good; concurrent requests see the same broken pool, so only the
+        # first one to get here swaps in a new one
+        if get_rule_pool() is pool:
+            print("Rule worker pool broken, starting a new one")
+            get_rule_pool.cache_clear()
+            pool.shutdown(wait=False)
+        return await loop.run_in_executor(get_rule_pool(), _run_rule_engine, full_text)
+
+
+def _log_summary(aggregator: ResultAggregator, result: AnalysisResult):
+    """Print the human-readable summary after the response has been sent"""
+    print(aggregator.generate_summary(result))
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Stop rule engine worker processes and the parse thread if any were started"""
+    if get_rule_pool.cache_info().currsize:
+        get_rule_pool().shutdown()
+    if get_parse_executor.cache_info().currsize:
+        get_parse_executor().shutdown()
+
+
 @app.get("/", response_model=dict)
 async def root():
     """Root endpoint"""
@@ -71,6 +159,7 @@ async def health_check():
 
 @app.post("/analyze", response_model=AnalysisResult)
 async def analyze_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     use_claude: bool = True,
     use_gpt: bool = True,
@@ -80,6 +169,7 @@ async def analyze_document(
     Analyze M&A contract PDF for red flags
     
     Args:
+        background_tasks: Work deferred until after the response is sent
         file: PDF file to analyze
         use_claude: Enable Claude analysis (default: True)
         use_gpt: Enable GPT-4 analysis (default: True)
@@ -94,38 +184,39 @@ async def analyze_document(
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    # Save uploaded file temporarily
+    # Save uploaded file temporarily (streamed so large PDFs never sit in memory)
+    tmp_file_path = None
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
             tmp_file_path = tmp_file.name
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                tmp_file.write(chunk)
         
         # Step 1: Parse PDF
         print(f"[1/4] Parsing PDF: {file.filename}")
-        parser = PDFParser()
-        parsed_data = parser.parse(tmp_file_path)
+        parser = get_pdf_parser()
+        loop = asyncio.get_running_loop()
+        parsed_data = await loop.run_in_executor(get_parse_executor(), parser.parse, tmp_file_path)
         full_text = parsed_data["full_text"]
         
         # Step 2: Rule-based analysis (fast)
         rule_flags = []
         if use_rules:
             print(f"[2/4] Running rule-based checks...")
-            rule_engine = RuleEngine()
-            rule_flags = rule_engine.analyze(full_text)
+            rule_flags = await _run_rules_in_pool(full_text)
             print(f"  → Found {len(rule_flags)} rule-based flags")
         
         # Step 3: LLM analysis (parallel)
         llm_flags = []
         if use_claude or use_gpt:
             print(f"[3/4] Running LLM analysis (Claude: {use_claude}, GPT: {use_gpt})...")
-            llm_analyzer = LLMAnalyzer()
+            llm_analyzer = get_llm_analyzer()
             llm_flags = await llm_analyzer.analyze(full_text, use_claude, use_gpt)
             print(f"  → Found {len(llm_flags)} LLM flags")
         
         # Step 4: Aggregate results
         print(f"[4/4] Aggregating results...")
-        aggregator = ResultAggregator()
+        aggregator = get_aggregator()
         processing_time = time.time() - start_time
         
         result = aggregator.aggregate(
@@ -136,7 +227,7 @@ async def analyze_document(
         )
         
         print(f"✓ Analysis complete: {result.total_flags} flags in {processing_time:.2f}s")
-        print(aggregator.generate_summary(result))
+        background_tasks.add_task(_log_summary, aggregator, result)
         
         return result
         
@@ -145,34 +236,38 @@ async def analyze_document(
     
     finally:
         # Clean up temp file
-        if os.path.exists(tmp_file_path):
+        if tmp_file_path and os.path.exists(tmp_file_path):
             os.remove(tmp_file_path)
 
 
 @app.post("/analyze/batch")
-async def analyze_batch(files: list[UploadFile] = File(...)):
+async def analyze_batch(background_tasks: BackgroundTasks, files: list[UploadFile] = File(...)):
     """
     Analyze multiple PDF files
     
-    Note: This is a simple sequential implementation.
+    Files are analyzed concurrently, at most BATCH_CONCURRENCY at a time
+    to stay within LLM provider rate limits.
     For production, implement proper queuing (Celery, etc.)
     """
-    results = []
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def analyze_one(file: UploadFile) -> dict:
+        async with semaphore:
+            try:
+                result = await analyze_document(background_tasks, file)
+                return {
+                    "filename": file.filename,
+                    "status": "success",
+                    "result": result
+                }
+            except Exception as e:
+                return {
+                    "filename": file.filename,
+                    "status": "failed",
+                    "error": str(e)
+                }
     
-    for file in files:
-        try:
-            result = await analyze_document(file)
-            results.append({
-                "filename": file.filename,
-                "status": "success",
-                "result": result
-            })
-        except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "status": "failed",
-                "error": str(e)
-            })
+    results = await asyncio.gather(*(analyze_one(file) for file in files))
     
     return {"results": results}
 
@@ -39,6 +39,14 @@ pydantic==2.5.0
 pydantic-settings==2.1.0
 python-dotenv==1.0.0
 aiohttp==3.9.1
+diskcache==5.6.3
+orjson==3.9.10
+numpy==1.26.2
+numba==0.58.1  # optional: compiled dedup for very large flag sets
+google-re2==1.1  # optional: DFA term scans in the rule engine
+pyahocorasick==2.0.0  # optional: Aho-Corasick term scans in the rule engine
+pcre2==0.7.1  # optional: JIT-compiled pattern checks in the rule engine
+hyperscan==0.9.1  # optional: SIMD term scans in the rule engine (ASCII documents)
 """
 
 # .env (create this file with your actual keys)
@@ -1,244 +1,633 @@
 """
 Rule-based analyzer for fast, deterministic red flag detection
 """
+import codecs
+import hashlib
 import re
-from typing import List, Dict, Any
+import sys
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Iterator, NamedTuple, Optional, Sequence, Tuple
 from models.schemas import RedFlag, SeverityLevel, FlagCategory
 from utils.config import OFFSHORE_JURISDICTIONS, WEASEL_WORDS, HIGH_RISK_PHRASES
 
 
+try:
+    import hyperscan
+except ImportError:  # hyperscan is optional; term scans fall back to the others
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; term scans fall back to regex
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:  # google-re2 is optional; term scans fall back to re
+    re2 = None
+
+try:
+    import pcre2
+except ImportError:  # pcre2 is optional; pattern checks fall back to re
+    pcre2 = None
+
+
+# Non-ASCII letters that re.IGNORECASE matches to ASCII "i"/"s" but that
+# survive lower() unchanged (or change length) and that RE2 may not fold
+_FOLD_EXOTICS = ("\u0130", "\u0131", "\u017f")
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+def _is_word_boundary(text: str, index: int) -> bool:
+    """Whether a regex word boundary (\\b) holds at text[index]"""
+    before = index > 0 and _is_word_char(text[index - 1])
+    after = index < len(text) and _is_word_char(text[index])
+    return before != after
+
+
+def _shorter_prefix_terms(terms: Sequence[str]) -> Dict[str, List[Tuple[str, int]]]:
+    """Map each term to the (term, length) of shorter terms matching at its start"""
+    prefixes: Dict[str, List[Tuple[str, int]]] = {}
+    for term in terms:
+        for other in terms:
+            if len(other) < len(term) and re.match(rf'{re.escape(other)}\b', term, re.IGNORECASE):
+                prefixes.setdefault(sys.intern(term.casefold()), []).append((sys.intern(other.casefold()), len(other)))
+    return prefixes
+
+
+class _TermMatcher:
+    """
+    Case-insensitive whole-word finder for a fixed term list
+    
+    One alternation scans the text once and reports every occurrence of
+    every term, overlaps included ("British Virgin Islands" also yields
+    "Virgin Islands"), exactly like scanning each term separately.
+    
+    Backends, fastest first: a Hyperscan database over the bytes of ASCII
+    documents, an Aho-Corasick automaton over the lowercased text
+    (pyahocorasick), an RE2 DFA over the UTF-8 bytes (google-re2), or a
+    zero-width lookahead alternation in re.
+    """
+    
+    def __init__(self, terms: Sequence[str]):
+        self._prefixes = _shorter_prefix_terms(terms)
+        self._lowered = tuple(term.lower() for term in terms)
+        self._term_keys = tuple(sys.intern(term.casefold()) for term in terms)
+        
+        if hyperscan is not None and terms:
+            # One expression per term, reporting every match with its start;
+            # \b is ASCII here, which is only exact on ASCII documents
+            self._database = hyperscan.Database()
+            self._database.compile(
+                expressions=[rf'\b{re.escape(term)}\b'.encode() for term in terms],
+                ids=list(range(len(terms))),
+                elements=len(terms),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(terms)
+            )
+            # Scratch space must not be shared between concurrent scans
+            self._scratch = threading.local()
+        else:
+            self._database = None
+        
+        if ahocorasick is not None and terms:
+            self._automaton = ahocorasick.Automaton()
+            for term in terms:
+                self._automaton.add_word(term.lower(), (sys.intern(term.casefold()), len(term.lower())))
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+        
+        # Longest first so the longest term wins when several start at one offset
+        ordered = sorted(terms, key=len, reverse=True)
+        alternatives = '|'.join(re.escape(t) for t in ordered)
+        # One group per term: re folds "ı" onto "i", so the matched text does
+        # not always case-fold back to its term, but the group index does
+        self._keys = tuple(sys.intern(t.casefold()) for t in ordered)
+        grouped = '|'.join(f'({re.escape(t)})' for t in ordered)
+        self._re = re.compile(rf'(?=\b(?:{grouped})\b)', re.IGNORECASE)
+        self._re2 = re2.compile(rf'(?i)\b({alternatives})\b'.encode()) if re2 is not None else None
+    
+    def spans(self, text: str, text_lower: str, text_utf8: bytes) -> Iterator[Tuple[str, int, int]]:
+        """Yield (case-folded term, start, end) for every hit; each term's hits in text order"""
+        # UTF-8 is one byte per character exactly when the text is ASCII
+        if self._database is not None and text_utf8 and len(text_utf8) == len(text):
+            yield from self._hyperscan_hits(text_utf8)
+            return
+        
+        if any(char in text for char in _FOLD_EXOTICS):
+            # Only re folds these onto ASCII terms, so skip every shortcut
+            hits = self._re_hits(text)
+        elif self._automaton is not None and len(text_lower) == len(text):
+            # Lowercasing can change the length of exotic text; the
+            # automaton needs offsets that line up with the original text
+            yield from self._automaton_hits(text, text_lower)
+            return
+        elif self._re2 is not None:
+            hits = self._re2_hits(text, text_utf8)
+        else:
+            # The lookahead alternation is tried at every offset; C-level
+            # substring checks on the lowercased text are an order of
+            # magnitude cheaper and rule out lists with no term present
+            if not any(term in text_lower for term in self._lowered):
+                return
+            hits = self._re_hits(text)
+        for term, start, end in hits:
+            yield term, start, end
+            for prefix, length in self._prefixes.get(term, ()):
+                yield prefix, start, start + length
+    
+    def _hyperscan_hits(self, data: bytes) -> List[Tuple[str, int, int]]:
+        # Hyperscan reports overlapping hits itself, ordered by end offset,
+        # which keeps each term's own hits in text order
+        scratch = getattr(self._scratch, 'scratch', None)
+        if scratch is None:
+            scratch = self._scratch.scratch = hyperscan.Scratch(self._database)
+        
+        keys = self._term_keys
+        hits: List[Tuple[str, int, int]] = []
+        
+        def on_match(term_id: int, start: int, end: int, flags: int, context: Any) -> None:
+            hits.append((keys[term_id], start, end))
+        
+        self._database.scan(data, match_event_handler=on_match, scratch=scratch)
+        return hits
+    
+    def _automaton_hits(self, text: str, text_lower: str) -> Iterator[Tuple[str, int, int]]:
+        # The automaton reports every overlapping hit itself, so the prefix
+        # table is not needed; word boundaries are checked on the original text
+        for end_index, (term, length) in self._automaton.iter(text_lower):
+            start = end_index - length + 1
+            end = end_index + 1
+            if _is_word_boundary(text, start) and _is_word_boundary(text, end):
+                yield term, start, end
+    
+    def _re_hits(self, text: str) -> Iterator[Tuple[str, int, int]]:
+        keys = self._keys
+        for match in self._re.finditer(text):
+            group = match.lastindex
+            yield keys[group - 1], match.start(), match.end(group)
+    
+    def _re2_hits(self, text: str, data: bytes) -> Iterator[Tuple[str, int, int]]:
+        # RE2 has no lookahead, so overlaps come from restarting one byte
+        # after each hit; byte offsets are mapped back to str offsets
+        # incrementally so the total decoding work stays O(len(text))
+        search = self._re2.search
+        char_pos = byte_pos = 0
+        match = search(data, 0)
+        while match is not None:
+            start = match.start()
+            char_pos += len(data[byte_pos:start].decode("utf-8", "surrogatepass"))
+            byte_pos = start
+            term = match.group(1).decode("utf-8", "surrogatepass")
+            hit = self._word_hit(text, term.casefold(), char_pos, char_pos + len(term))
+            if hit is not None:
+                yield hit
+            match = search(data, start + 1)
+    
+    def _word_hit(self, text: str, term: str, start: int, end: int) -> Optional[Tuple[str, int, int]]:
+        # RE2's \b treats every non-ASCII letter as a non-word character,
+        # so "Panamá" passes it; the boundaries are re-checked on the text,
+        # falling back to the longest shorter term that ends on one
+        if not _is_word_boundary(text, start):
+            return None
+        if _is_word_boundary(text, end):
+            return term, start, end
+        for prefix, length in sorted(self._prefixes.get(term, ()), key=lambda item: item[1], reverse=True):
+            if _is_word_boundary(text, start + length):
+                return prefix, start, start + length
+        return None
+
+
+# What the pattern rules see in place of a non-ASCII character: the ASCII
+# characters re.IGNORECASE equates with these, else a neutral NUL byte
+_ASCII_FOLDS = {"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"}
+# Folding costs a Python call per run of non-ASCII text; past this share
+# of extra UTF-8 bytes it outweighs scanning the compact buffer
+_MAX_FOLD_RATIO = 0.01
+
+
+class _NoAsciiStandIn(ValueError):
+    """Raised when folding text with a character no ASCII byte can stand in for"""
+
+
+@lru_cache(maxsize=None)
+def _ascii_stand_in(char: str) -> Optional[str]:
+    """The ASCII character every pattern rule treats exactly like char, if any"""
+    if char.isspace():
+        return " "
+    if char.isdecimal():
+        # \d matches a non-ASCII digit but a literal digit such as the
+        # "19" in _AUDIT_RE does not, so no ASCII byte behaves the same
+        return None
+    return _ASCII_FOLDS.get(char, "\x00")
+
+
+def _fold_to_ascii(error: UnicodeEncodeError) -> Tuple[str, int]:
+    """Encoding error handler: one ASCII stand-in per non-ASCII character"""
+    stand_ins = [_ascii_stand_in(char) for char in error.object[error.start:error.end]]
+    if None in stand_ins:
+        raise _NoAsciiStandIn(error.object[error.start:error.end])
+    return "".join(stand_ins), error.end
+
+
+codecs.register_error("dd_rule_ascii_fold", _fold_to_ascii)
+
+
+def _ascii_buffer(text: str, text_utf8: bytes) -> Optional[bytes]:
+    """One byte per character of text for the pattern rules, or None if too costly"""
+    extra_bytes = len(text_utf8) - len(text)
+    if not extra_bytes:
+        return text_utf8
+    if extra_bytes > len(text) * _MAX_FOLD_RATIO:
+        return None
+    # A curly quote or non-breaking space would otherwise make every
+    # pattern scan a two-byte-per-character string
+    try:
+        return text.encode("ascii", "dd_rule_ascii_fold")
+    except _NoAsciiStandIn:
+        return None
+
+
+class _Pattern:
+    """
+    A check pattern compiled for the document text and for its ASCII buffer
+    
+    The buffer (see _ascii_buffer) has one byte per character, so match
+    offsets are str offsets and context is still cut from the text. It is
+    scanned with PCRE2 and JIT when pcre2 is installed, else with re in
+    bytes mode. The pcre2 binding's UTF mode is far slower than re, so
+    text without a buffer stays on re.
+    """
+    
+    def __init__(self, pattern: str, flags: int = 0):
+        self._re = re.compile(pattern, flags)
+        
+        # re's str-mode \s also matches the ASCII separators \x1c-\x1f
+        ascii_pattern = pattern.replace(r'\s', r'[\s\x1c-\x1f]')
+        if pcre2 is not None:
+            jit_flags = (pcre2.IGNORECASE if flags & re.IGNORECASE else 0) | (pcre2.DOTALL if flags & re.DOTALL else 0)
+            # (*LF) pins "." to re's newline convention
+            self._ascii = pcre2.compile(('(*LF)' + ascii_pattern).encode(), jit_flags, jit=True)
+        else:
+            self._ascii = re.compile(ascii_pattern.encode(), flags)
+    
+    def finditer(self, text: str, text_ascii: Optional[bytes]) -> Iterator[Any]:
+        """Iterate matches; groups are bytes when the ASCII buffer was scanned"""
+        if text_ascii is not None:
+            return self._ascii.finditer(text_ascii)
+        return self._re.finditer(text)
+
+
+def _frozen_terms(terms: Sequence[str]) -> Tuple[Tuple[str, str], ...]:
+    """Snapshot a config term list as interned (term, case-folded key) pairs"""
+    return tuple((sys.intern(term), sys.intern(term.casefold())) for term in terms)
+
+
+# Config term lists are frozen once; keys are interned so lookups of the
+# matcher's case-folded hits compare by identity
+_OFFSHORE_JURISDICTIONS = _frozen_terms(OFFSHORE_JURISDICTIONS)
+_WEASEL_WORDS = _frozen_terms(WEASEL_WORDS)
+_HIGH_RISK_PHRASES = _frozen_terms(HIGH_RISK_PHRASES)
+
+# Keywords that put an offshore reference in a dispute-resolution clause
+_GOV_KEYWORDS = ("governing law", "arbitration", "dispute resolution")
+
+# All patterns are compiled once at import and shared by every RuleEngine
+_OFFSHORE_TERMS = _TermMatcher([term for term, _ in _OFFSHORE_JURISDICTIONS])
+_WEASEL_TERMS = _TermMatcher([term for term, _ in _WEASEL_WORDS])
+_HIGH_RISK_TERMS = _TermMatcher([term for term, _ in _HIGH_RISK_PHRASES])
+
+# Phrases indicating schedules are missing, with a ~100 char context window
+_MISSING_INDICATORS = (
+    "being finalized", "to be provided", "being compiled",
+    "will be attached", "to be determined"
+)
+_MISSING_CONTEXT_RES = tuple(
+    (indicator, re.compile(rf'.{{0,100}}{re.escape(indicator)}.{{0,100}}', re.IGNORECASE))
+    for indicator in _MISSING_INDICATORS
+)
+
+_AUDIT_RE = _Pattern(r'audit(?:ed)?[^.]{0,50}(?:19|20)(\d{2})', re.IGNORECASE)
+_SURVIVAL_RE = _Pattern(r'(?:surviv|representations).*?(\d+)\s*(?:months?|days?)', re.IGNORECASE)
+_CONCENTRATION_RE = _Pattern(r'top\s+\d+\s+customers?.*?(\d+)%', re.IGNORECASE)
+
+# Audits from before this year are too old to rely on
+_CURRENT_AUDIT_CUTOFF = 2023
+# Two-digit audit years: above 50 is 19xx, the rest 20xx
+_AUDIT_FULL_YEARS = tuple(1900 + year if year > 50 else 2000 + year for year in range(100))
+_MIN_SURVIVAL_MONTHS = 12
+_HIGH_CONCENTRATION_PERCENT = 50
+_CRITICAL_CONCENTRATION_PERCENT = 70
+
+
+
+def _flag_template(category: FlagCategory, severity: SeverityLevel, score: int,
+                   title: str = "", description: str = "",
+                   recommendation: Optional[str] = None) -> RedFlag:
+    """Prebuilt flag for one rule; hits copy it and fill in the per-match fields"""
+    return RedFlag(
+        category=category,
+        severity=severity,
+        title=title,
+        description=description,
+        location="",
+        score=score,
+        source="rule_engine",
+        recommendation=recommendation
+    )
+
+
+# One validated template per rule outcome, copied with model_copy per hit
+_OFFSHORE_FLAGS = {
+    severity: _flag_template(
+        FlagCategory.JURISDICTION, severity, score,
+        recommendation="Require arbitration in neutral jurisdiction (Delaware, New York, or London). Investigate why offshore jurisdiction was chosen."
+    )
+    for severity, score in ((SeverityLevel.CRITICAL, 9), (SeverityLevel.HIGH, 7))
+}
+_WEASEL_FLAG = _flag_template(FlagCategory.VAGUE_LANGUAGE, SeverityLevel.MEDIUM, 5)
+_HIGH_RISK_FLAG = _flag_template(
+    FlagCategory.MISSING_INFO, SeverityLevel.HIGH, 8,
+    description="Critical information is deferred or incomplete. This is a major red flag - you're signing before having full information.",
+    recommendation="STOP. Do not sign until all referenced information is provided and reviewed. No post-closing surprises."
+)
+_MISSING_SCHEDULES_FLAG = _flag_template(
+    FlagCategory.MISSING_INFO, SeverityLevel.CRITICAL, 10,
+    title="Missing or Incomplete Schedules",
+    recommendation="Require all schedules to be completed and attached before signing. Missing schedules = unknown liabilities."
+)
+_OUTDATED_AUDIT_FLAG = _flag_template(
+    FlagCategory.FINANCIAL, SeverityLevel.HIGH, 7,
+    recommendation="Require current audited financials (within 12 months). Outdated audits hide recent problems."
+)
+_SURVIVAL_FLAG = _flag_template(FlagCategory.LIABILITY, SeverityLevel.HIGH, 7)
+_CONCENTRATION_FLAGS = {
+    severity: _flag_template(
+        FlagCategory.CUSTOMER, severity, score,
+        recommendation="Require customer retention agreements, escrow protection, or earnout tied to customer retention."
+    )
+    for severity, score in ((SeverityLevel.CRITICAL, 9), (SeverityLevel.HIGH, 7))
+}
+
+# Each payment trigger must follow its keyword within the same sentence; an
+# unbounded DOTALL ".*" spanned the whole document from the first keyword
+_EARNOUT_RE = _Pattern(r"earnout[^.\n]{0,200}(?:undefined|to be determined|mutually agreed)", re.IGNORECASE)
+_DEFERRED_RE = _Pattern(r"deferred[^.\n]{0,200}(?:performance metrics|to be determined)", re.IGNORECASE)
+
+_PAYMENT_DESCRIPTION = "Payment terms are incomplete or subject to future agreement. This creates massive dispute risk."
+_EARNOUT_FLAG = _flag_template(
+    FlagCategory.FINANCIAL, SeverityLevel.CRITICAL, 10,
+    title="Undefined Earnout Targets",
+    description=_PAYMENT_DESCRIPTION,
+    recommendation="Never accept undefined earnout metrics. Specify exact EBITDA/revenue targets and calculation methods."
+)
+_DEFERRED_PAYMENT_FLAG = _flag_template(
+    FlagCategory.FINANCIAL, SeverityLevel.HIGH, 8,
+    title="Undefined Deferred Payment Terms",
+    description=_PAYMENT_DESCRIPTION,
+    recommendation="All deferred payment triggers must be clearly defined at signing."
+)
+
+
+def _get_context(text: str, start: int, end: int, chars: int = 150) -> str:
+    """Extract context around a match"""
+    context_start = start - chars
+    context_end = end + chars
+    prefix = "..." if context_start > 0 else ""
+    suffix = "..." if context_end < len(text) else ""
+    return f"{prefix}{text[max(0, context_start):context_end].strip()}{suffix}"
+
+
+def _outdated_audit_flag(text: str, match: Any) -> Optional[RedFlag]:
+    """Flag suspicious dates (very old audits, future dates, etc.)"""
+    full_year = _AUDIT_FULL_YEARS[int(match.group(1))]
+    
+    # Flag audits older than 2 years
+    if full_year >= _CURRENT_AUDIT_CUTOFF:
+        return None
+    return _OUTDATED_AUDIT_FLAG.model_copy(update={
+        "title": f"Outdated Financial Audit ({full_year})",
+        "description": f"Most recent audit mentioned is from {full_year}, which is too old to be reliable.",
+        "location": _get_context(text, match.start(), match.end())
+    })
+
+
+def _payment_flag(template: RedFlag) -> Callable[[str, Any], RedFlag]:
+    """Flag suspicious payment structures; every match copies the same template"""
+    def build(text: str, match: Any) -> RedFlag:
+        return template.model_copy(update={"location": _get_context(text, match.start(), match.end())})
+    return build
+
+
+def _short_survival_flag(text: str, match: Any) -> Optional[RedFlag]:
+    """Flag aggressive liability caps or limitations"""
+    period = int(match.group(1))
+    if period >= _MIN_SURVIVAL_MONTHS:  # Less than 12 months is suspicious
+        return None
+    return _SURVIVAL_FLAG.model_copy(update={
+        "title": f"Short Survival Period ({period} months)",
+        "description": f"Representations survive only {period} months. Industry standard is 18-24 months minimum.",
+        "location": _get_context(text, match.start(), match.end()),
+        "recommendation": f"Negotiate longer survival period (minimum 18 months). {period} months is insufficient for most issues to surface."
+    })
+
+
+def _customer_concentration_flag(text: str, match: Any) -> Optional[RedFlag]:
+    """Flag high customer concentration risks"""
+    percentage = int(match.group(1))
+    if percentage <= _HIGH_CONCENTRATION_PERCENT:
+        return None
+    severity = SeverityLevel.CRITICAL if percentage > _CRITICAL_CONCENTRATION_PERCENT else SeverityLevel.HIGH
+    return _CONCENTRATION_FLAGS[severity].model_copy(update={
+        "title": f"High Customer Concentration ({percentage}%)",
+        "description": f"Top customers represent {percentage}% of revenue. Loss of any major customer could be catastrophic.",
+        "location": _get_context(text, match.start(), match.end())
+    })
+
+
+class _Rule(NamedTuple):
+    """A pattern check: build turns each match into a flag, or None to skip it"""
+    pattern: _Pattern
+    build: Callable[[str, Any], Optional[RedFlag]]
+
+
+# Pattern checks, in the order their flags are reported
+_PATTERN_RULES = (
+    _Rule(_AUDIT_RE, _outdated_audit_flag),
+    _Rule(_EARNOUT_RE, _payment_flag(_EARNOUT_FLAG)),
+    _Rule(_DEFERRED_RE, _payment_flag(_DEFERRED_PAYMENT_FLAG)),
+    _Rule(_SURVIVAL_RE, _short_survival_flag),  # indemnification survival periods
+    _Rule(_CONCENTRATION_RE, _customer_concentration_flag),  # "top 10 customers represent X%"
+)
+
+
+# Results of this many recent documents are kept per engine
+RESULT_CACHE_SIZE = 128
+
+
 class RuleEngine:
     """Fast rule-based checks before expensive LLM calls"""
     
     def __init__(self):
         self.flags: List[RedFlag] = []
+        self._text_lower = ""
+        self._text_utf8 = b""
+        self._text_ascii: Optional[bytes] = None
+        # Content hash -> flags, least recently used first
+        self._results: "OrderedDict[bytes, List[RedFlag]]" = OrderedDict()
     
     def analyze(self, full_text: str) -> List[RedFlag]:
         """Run all rule-based checks"""
-        self.flags = []
-        
-        # Run all checks
-        self._check_offshore_jurisdictions(full_text)
-        self._check_weasel_words(full_text)
-        self._check_high_risk_phrases(full_text)
-        self._check_missing_schedules(full_text)
-        self._check_date_anomalies(full_text)
-        self._check_payment_red_flags(full_text)
-        self._check_liability_limitations(full_text)
-        self._check_customer_concentration(full_text)
+        # Retries and re-uploads of the same document reuse the earlier result
+        text_utf8 = full_text.encode("utf-8", "surrogatepass")
+        key = hashlib.blake2b(text_utf8, digest_size=16).digest()
+        cached = self._cached_result(key)
+        if cached is not None:
+            self.flags = list(cached)
+            return self.flags
+        
+        try:
+            self.flags = list(self._run_checks(full_text, text_utf8))
+        finally:
+            # Drop the per-document copies so a long-lived engine (one per
+            # pool worker) does not keep the last document alive
+            self._text_lower = ""
+            self._text_utf8 = b""
+            self._text_ascii = None
+        
+        # Cache a copy so callers can extend the returned list freely
+        self._results[key] = list(self.flags)
+        if len(self._results) > RESULT_CACHE_SIZE:
+            self._results.popitem(last=False)
         
         return self.flags
     
-    def _check_offshore_jurisdictions(self, text: str):
+    def _cached_result(self, key: bytes) -> Optional[List[RedFlag]]:
+        """Flags from an earlier run on the same content, if still cached"""
+        cached = self._results.get(key)
+        if cached is not None:
+            self._results.move_to_end(key)
+        return cached
+    
+    def _run_checks(self, full_text: str, text_utf8: bytes) -> Iterator[RedFlag]:
+        """Yield the flags of every check in turn"""
+        # Derived once per document and shared by all checks
+        self._text_lower = full_text.lower()
+        self._text_utf8 = text_utf8 if re2 is not None or hyperscan is not None else b""
+        self._text_ascii = _ascii_buffer(full_text, text_utf8)
+        
+        for check in (
+            self._check_offshore_jurisdictions,
+            self._check_weasel_words,
+            self._check_high_risk_phrases,
+            self._check_missing_schedules,
+            self._check_pattern_rules,
+        ):
+            yield from check(full_text)
+    
+    def _check_offshore_jurisdictions(self, text: str) -> Iterator[RedFlag]:
         """Flag offshore jurisdiction clauses"""
-        for jurisdiction in OFFSHORE_JURISDICTIONS:
-            pattern = rf'\b{re.escape(jurisdiction)}\b'
-            matches = list(re.finditer(pattern, text, re.IGNORECASE))
-            
-            for match in matches:
-                context = self._get_context(text, match.start(), match.end())
+        spans_by_term = self._spans_by_term(_OFFSHORE_TERMS, text)
+        
+        for jurisdiction, key in _OFFSHORE_JURISDICTIONS:
+            for start, end in spans_by_term.get(key, ()):
+                context = _get_context(text, start, end)
                 
                 # Higher severity if in governing law or arbitration section
-                severity = SeverityLevel.CRITICAL if any(
-                    keyword in context.lower() 
-                    for keyword in ["governing law", "arbitration", "dispute resolution"]
+                severity = SeverityLevel.CRITICAL if self._window_has_any(
+                    text, start, end, _GOV_KEYWORDS
                 ) else SeverityLevel.HIGH
                 
-                self.flags.append(RedFlag(
-                    category=FlagCategory.JURISDICTION,
-                    severity=severity,
-                    title=f"Offshore Jurisdiction: {jurisdiction}",
-                    description=f"Document references {jurisdiction}, which may indicate jurisdiction shopping or regulatory arbitrage.",
-                    location=context,
-                    score=9 if severity == SeverityLevel.CRITICAL else 7,
-                    source="rule_engine",
-                    recommendation="Require arbitration in neutral jurisdiction (Delaware, New York, or London). Investigate why offshore jurisdiction was chosen."
-                ))
-    
-    def _check_weasel_words(self, text: str):
+                yield _OFFSHORE_FLAGS[severity].model_copy(update={
+                    "title": f"Offshore Jurisdiction: {jurisdiction}",
+                    "description": f"Document references {jurisdiction}, which may indicate jurisdiction shopping or regulatory arbitrage.",
+                    "location": context
+                })
+    
+    def _check_weasel_words(self, text: str) -> Iterator[RedFlag]:
         """Flag vague, non-committal language"""
-        weasel_count = {}
+        # One pass over the text counts every weasel word at once
+        weasel_count: Counter = Counter()
+        first_spans: Dict[str, Tuple[int, int]] = {}
+        
+        for term, start, end in _WEASEL_TERMS.spans(text, self._text_lower, self._text_utf8):
+            weasel_count[term] += 1
+            if term not in first_spans:
+                first_spans[term] = (start, end)
         
-        for word in WEASEL_WORDS:
-            pattern = rf'\b{re.escape(word)}\b'
-            matches = list(re.finditer(pattern, text, re.IGNORECASE))
+        for word, key in _WEASEL_WORDS:
+            count = weasel_count[key]
             
-            if matches:
-                weasel_count[word] = len(matches)
+            # Only flag if excessive (more than 3 uses)
+            if count > 3:
+                start, end = first_spans[key]
+                context = _get_context(text, start, end)
                 
-                # Only flag if excessive (more than 3 uses)
-                if len(matches) > 3:
-                    first_match = matches[0]
-                    context = self._get_context(text, first_match.start(), first_match.end())
-                    
-                    self.flags.append(RedFlag(
-                        category=FlagCategory.VAGUE_LANGUAGE,
-                        severity=SeverityLevel.MEDIUM,
-                        title=f"Excessive Vague Language: '{word}' ({len(matches)}x)",
-                        description=f"Term '{word}' appears {len(matches)} times. Vague language creates ambiguity and potential for disputes.",
-                        location=context,
-                        score=5,
-                        source="rule_engine",
-                        recommendation=f"Request specific definitions and thresholds. Replace '{word}' with measurable criteria."
-                    ))
-    
-    def _check_high_risk_phrases(self, text: str):
+                yield _WEASEL_FLAG.model_copy(update={
+                    "title": f"Excessive Vague Language: '{word}' ({count}x)",
+                    "description": f"Term '{word}' appears {count} times. Vague language creates ambiguity and potential for disputes.",
+                    "location": context,
+                    "recommendation": f"Request specific definitions and thresholds. Replace '{word}' with measurable criteria."
+                })
+    
+    def _check_high_risk_phrases(self, text: str) -> Iterator[RedFlag]:
         """Flag phrases indicating incomplete or deferred disclosures"""
-        for phrase in HIGH_RISK_PHRASES:
-            pattern = rf'\b{re.escape(phrase)}\b'
-            matches = list(re.finditer(pattern, text, re.IGNORECASE))
-            
-            for match in matches:
-                context = self._get_context(text, match.start(), match.end())
+        spans_by_term = self._spans_by_term(_HIGH_RISK_TERMS, text)
+        
+        for phrase, key in _HIGH_RISK_PHRASES:
+            for start, end in spans_by_term.get(key, ()):
+                context = _get_context(text, start, end)
                 
-                self.flags.append(RedFlag(
-                    category=FlagCategory.MISSING_INFO,
-                    severity=SeverityLevel.HIGH,
-                    title=f"Deferred Disclosure: '{phrase}'",
-                    description="Critical information is deferred or incomplete. This is a major red flag - you're signing before having full information.",
-                    location=context,
-                    score=8,
-                    source="rule_engine",
-                    recommendation="STOP. Do not sign until all referenced information is provided and reviewed. No post-closing surprises."
-                ))
-    
-    def _check_missing_schedules(self, text: str):
+                yield _HIGH_RISK_FLAG.model_copy(update={
+                    "title": f"Deferred Disclosure: '{phrase}'",
+                    "location": context
+                })
+    
+    def _check_missing_schedules(self, text: str) -> Iterator[RedFlag]:
         """Flag references to missing schedules/exhibits"""
-        # Find all schedule references
-        schedule_pattern = r'Schedule\s+([A-Z0-9]+(?:\([a-z0-9]+\))?)'
-        referenced_schedules = set(re.findall(schedule_pattern, text, re.IGNORECASE))
-        
-        # Look for phrases indicating schedules are missing
-        missing_indicators = [
-            "being finalized", "to be provided", "being compiled",
-            "will be attached", "to be determined"
-        ]
-        
-        for indicator in missing_indicators:
-            if indicator in text.lower():
-                context_match = re.search(rf'.{{0,100}}{indicator}.{{0,100}}', text, re.IGNORECASE)
+        # Look for phrases indicating schedules are missing. The context regex
+        # starts just before the first hit: from offset 0 its leading
+        # .{0,100} would be retried at every position up to the hit
+        aligned = len(self._text_lower) == len(text)
+        
+        for indicator, context_re in _MISSING_CONTEXT_RES:
+            position = self._text_lower.find(indicator)
+            if position != -1:
+                context_match = context_re.search(text, max(0, position - 100) if aligned else 0)
                 if context_match:
-                    self.flags.append(RedFlag(
-                        category=FlagCategory.MISSING_INFO,
-                        severity=SeverityLevel.CRITICAL,
-                        title="Missing or Incomplete Schedules",
-                        description=f"Schedules are incomplete: '{indicator}'. Never sign with missing schedules.",
-                        location=context_match.group(0),
-                        score=10,
-                        source="rule_engine",
-                        recommendation="Require all schedules to be completed and attached before signing. Missing schedules = unknown liabilities."
-                    ))
+                    yield _MISSING_SCHEDULES_FLAG.model_copy(update={
+                        "description": f"Schedules are incomplete: '{indicator}'. Never sign with missing schedules.",
+                        "location": context_match.group(0)
+                    })
                     break  # Only flag once
     
-    def _check_date_anomalies(self, text: str):
-        """Flag suspicious dates (very old audits, future dates, etc.)"""
-        # Look for audit dates
-        audit_pattern = r'audit(?:ed)?[^.]{0,50}(?:19|20)(\d{2})'
-        matches = re.finditer(audit_pattern, text, re.IGNORECASE)
-        
-        for match in matches:
-            year = int(match.group(1))
-            full_year = 1900 + year if year > 50 else 2000 + year
-            
-            # Flag audits older than 2 years
-            if full_year < 2023:
-                context = self._get_context(text, match.start(), match.end())
-                self.flags.append(RedFlag(
-                    category=FlagCategory.FINANCIAL,
-                    severity=SeverityLevel.HIGH,
-                    title=f"Outdated Financial Audit ({full_year})",
-                    description=f"Most recent audit mentioned is from {full_year}, which is too old to be reliable.",
-                    location=context,
-                    score=7,
-                    source="rule_engine",
-                    recommendation="Require current audited financials (within 12 months). Outdated audits hide recent problems."
-                ))
-    
-    def _check_payment_red_flags(self, text: str):
-        """Flag suspicious payment structures"""
-        red_flags = {
-            "earnout.*(?:undefined|to be determined|mutually agreed)": {
-                "title": "Undefined Earnout Targets",
-                "severity": SeverityLevel.CRITICAL,
-                "score": 10,
-                "recommendation": "Never accept undefined earnout metrics. Specify exact EBITDA/revenue targets and calculation methods."
-            },
-            "deferred.*(?:performance metrics|to be determined)": {
-                "title": "Undefined Deferred Payment Terms",
-                "severity": SeverityLevel.HIGH,
-                "score": 8,
-                "recommendation": "All deferred payment triggers must be clearly defined at signing."
-            }
-        }
-        
-        for pattern, flag_info in red_flags.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE | re.DOTALL)
-            for match in matches:
-                context = self._get_context(text, match.start(), match.end())
-                self.flags.append(RedFlag(
-                    category=FlagCategory.FINANCIAL,
-                    severity=flag_info["severity"],
-                    title=flag_info["title"],
-                    description="Payment terms are incomplete or subject to future agreement. This creates massive dispute risk.",
-                    location=context,
-                    score=flag_info["score"],
-                    source="rule_engine",
-                    recommendation=flag_info["recommendation"]
-                ))
-    
-    def _check_liability_limitations(self, text: str):
-        """Flag aggressive liability caps or limitations"""
-        # Look for indemnification survival periods
-        survival_pattern = r'(?:surviv|representations).*?(\d+)\s*(?:months?|days?)'
-        matches = re.finditer(survival_pattern, text, re.IGNORECASE)
-        
-        for match in matches:
-            period = int(match.group(1))
-            if period < 12:  # Less than 12 months is suspicious
-                context = self._get_context(text, match.start(), match.end())
-                self.flags.append(RedFlag(
-                    category=FlagCategory.LIABILITY,
-                    severity=SeverityLevel.HIGH,
-                    title=f"Short Survival Period ({period} months)",
-                    description=f"Representations survive only {period} months. Industry standard is 18-24 months minimum.",
-                    location=context,
-                    score=7,
-                    source="rule_engine",
-                    recommendation=f"Negotiate longer survival period (minimum 18 months). {period} months is insufficient for most issues to surface."
-                ))
-    
-    def _check_customer_concentration(self, text: str):
-        """Flag high customer concentration risks"""
-        # Look for patterns like "top 10 customers represent X%"
-        concentration_pattern = r'top\s+\d+\s+customers?.*?(\d+)%'
-        matches = re.finditer(concentration_pattern, text, re.IGNORECASE)
-        
-        for match in matches:
-            percentage = int(match.group(1))
-            if percentage > 50:
-                context = self._get_context(text, match.start(), match.end())
-                severity = SeverityLevel.CRITICAL if percentage > 70 else SeverityLevel.HIGH
-                
-                self.flags.append(RedFlag(
-                    category=FlagCategory.CUSTOMER,
-                    severity=severity,
-                    title=f"High Customer Concentration ({percentage}%)",
-                    description=f"Top customers represent {percentage}% of revenue. Loss of any major customer could be catastrophic.",
-                    location=context,
-                    score=9 if percentage > 70 else 7,
-                    source="rule_engine",
-                    recommendation="Require customer retention agreements, escrow protection, or earnout tied to customer retention."
-                ))
-    
-    def _get_context(self, text: str, start: int, end: int, chars: int = 150) -> str:
-        """Extract context around a match"""
-        context_start = max(0, start - chars)
-        context_end = min(len(text), end + chars)
-        context = text[context_start:context_end].strip()
-        
-        if context_start > 0:
-            context = "..." + context
-        if context_end < len(text):
-            context = context + "..."
-        
-        return context
\ No newline at end of file
+    def _check_pattern_rules(self, text: str) -> Iterator[RedFlag]:
+        """Run the table of pattern checks: audit dates, payment terms, survival, concentration"""
+        for pattern, build in _PATTERN_RULES:
+            for match in pattern.finditer(text, self._text_ascii):
+                flag = build(text, match)
+                if flag is not None:
+                    yield flag
+    
+    def _spans_by_term(self, matcher: _TermMatcher, text: str) -> Dict[str, List[Tuple[int, int]]]:
+        """Scan once for all of a matcher's terms and group hit spans by case-folded term"""
+        spans_by_term: Dict[str, List[Tuple[int, int]]] = {}
+        for term, start, end in matcher.spans(text, self._text_lower, self._text_utf8):
+            spans_by_term.setdefault(term, []).append((start, end))
+        return spans_by_term
+    
+    def _window_has_any(self, text: str, start: int, end: int, keywords: Sequence[str], chars: int = 150) -> bool:
+        """Whether the lowercased context window contains any keyword"""
+        window_start = max(0, start - chars)
+        window_end = end + chars
+        if len(self._text_lower) == len(text):
+            # Bounded finds on the per-document lowercase copy; no window is copied out
+            text_lower = self._text_lower
+            return any(text_lower.find(keyword, window_start, window_end) != -1 for keyword in keywords)
+        window = text[window_start:window_end].lower()
+        return any(keyword in window for keyword in keywords)
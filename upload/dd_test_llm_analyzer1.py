@@ -0,0 +1,96 @@
+"""
+Regression tests for the LLM analyzer (tests/test_llm_analyzer.py)
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from analyzers import llm_analyzer
+from analyzers.llm_analyzer import LLMAnalyzer
+
+
+@pytest.fixture
+def analyzer():
+    # Parsing needs neither API clients nor the response cache
+    return LLMAnalyzer.__new__(LLMAnalyzer)
+
+
+FLAG_JSON = '{"flags": [{"category": "tax", "severity": "HIGH", "title": "Tax exposure", "score": 7}]}'
+
+
+@pytest.mark.parametrize("reply", [
+    FLAG_JSON,
+    "```json\n" + FLAG_JSON + "\n```",
+    "```\n" + FLAG_JSON + "\n```",
+    "  \n" + FLAG_JSON + "\n```  ",
+])
+def test_parses_fenced_and_bare_replies(analyzer, reply):
+    flags = analyzer._parse_llm_response(reply, source="gpt4")
+    assert [flag.title for flag in flags] == ["Tax exposure"]
+
+
+@pytest.mark.parametrize("whitespace", [" ", "\n", " \n\t"])
+def test_long_whitespace_runs_parse_quickly(analyzer, whitespace):
+    padding = whitespace * (10_000 // len(whitespace))
+    reply = '{"flags": [' + padding + ']' + padding + '}' + padding
+    start = time.perf_counter()
+    assert analyzer._parse_llm_response(reply, source="gpt4") == []
+    assert time.perf_counter() - start < 1.0
+
+
+class _FakeClaude:
+    """AsyncAnthropic stand-in that answers every request with FLAG_JSON"""
+    
+    def __init__(self, api_key: str):
+        self.messages = self
+        self.calls = 0
+    
+    async def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(content=[SimpleNamespace(text=FLAG_JSON)])
+
+
+class _FailingCache:
+    """diskcache stand-in whose reads and writes always fail"""
+    
+    def __init__(self, directory: str):
+        pass
+    
+    def get(self, key):
+        raise OSError("database disk image is malformed")
+    
+    def set(self, key, value, expire=None):
+        raise OSError("database or disk is full")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Build analyzers against fake clients instead of the real APIs"""
+    settings = SimpleNamespace(
+        anthropic_api_key="test", openai_api_key="test", claude_model="claude",
+        gpt_model="gpt", temperature=0.0, max_tokens=1000
+    )
+    monkeypatch.setattr(llm_analyzer, "get_settings", lambda: settings)
+    monkeypatch.setattr(llm_analyzer, "AsyncAnthropic", _FakeClaude)
+    monkeypatch.setattr(llm_analyzer, "AsyncOpenAI", lambda api_key: None)
+
+
+def test_unopenable_cache_runs_uncached(offline, monkeypatch):
+    def unwritable(directory):
+        raise PermissionError(f"cannot create {directory}")
+    monkeypatch.setattr(llm_analyzer, "Cache", unwritable)
+    
+    analyzer = LLMAnalyzer()
+    flags = asyncio.run(analyzer._analyze_chunk_with_claude("Contract text."))
+    assert analyzer.response_cache is None
+    assert [flag.title for flag in flags] == ["Tax exposure"]
+
+
+def test_cache_errors_count_as_misses(offline, monkeypatch):
+    monkeypatch.setattr(llm_analyzer, "Cache", _FailingCache)
+    
+    analyzer = LLMAnalyzer()
+    flags = asyncio.run(analyzer._analyze_chunk_with_claude("Contract text."))
+    assert analyzer.claude_client.calls == 1
+    assert [flag.title for flag in flags] == ["Tax exposure"]
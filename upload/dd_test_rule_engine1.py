@@ -0,0 +1,131 @@
+"""
+Regression tests for the rule engine (tests/test_rule_engine.py)
+
+Term and pattern scans have several backends, picked by what is installed;
+the fixtures pin each one in turn and compare it with plain re.
+"""
+import re
+
+import pytest
+from analyzers import rule_engine
+from analyzers.rule_engine import RuleEngine
+
+
+# Enough plain ASCII that a single non-ASCII sentence stays under the
+# fold ratio and the pattern rules would scan the one-byte buffer
+FILLER = "The purchaser shall pay the closing amount on the agreed date. " * 40
+
+# Term matcher backends, fastest first, and the attribute holding each one
+TERM_BACKENDS = {"hyperscan": "_database", "automaton": "_automaton", "re2": "_re2"}
+TERM_LISTS = (
+    (rule_engine._OFFSHORE_TERMS, rule_engine._OFFSHORE_JURISDICTIONS),
+    (rule_engine._WEASEL_TERMS, rule_engine._WEASEL_WORDS),
+    (rule_engine._HIGH_RISK_TERMS, rule_engine._HIGH_RISK_PHRASES),
+)
+
+
+@pytest.fixture(params=[*TERM_BACKENDS, "re"])
+def term_backend(request, monkeypatch):
+    """Pin every term matcher to one backend; re is always available"""
+    backend = request.param
+    if backend != "re" and getattr(rule_engine._OFFSHORE_TERMS, TERM_BACKENDS[backend]) is None:
+        pytest.skip(f"{backend} term backend is not installed")
+    for matcher, _ in TERM_LISTS:
+        for name, attr in TERM_BACKENDS.items():
+            if name != backend:
+                monkeypatch.setattr(matcher, attr, None)
+    return backend
+
+
+@pytest.fixture(params=["pcre2", "bytes"])
+def pattern_backend(request, monkeypatch):
+    """Pin the ASCII buffer scans of every pattern rule to PCRE2 or bytes re"""
+    if request.param == "pcre2":
+        if rule_engine.pcre2 is None:
+            pytest.skip("pcre2 pattern backend is not installed")
+        return request.param
+    
+    monkeypatch.setattr(rule_engine, "pcre2", None)
+    for pattern in list(vars(rule_engine).values()):
+        if isinstance(pattern, rule_engine._Pattern):
+            source = pattern._re
+            rebuilt = rule_engine._Pattern(source.pattern, source.flags & ~re.UNICODE)
+            monkeypatch.setattr(pattern, "_ascii", rebuilt._ascii)
+    return request.param
+
+
+def _per_term_spans(terms, text: str):
+    """Every whole-word hit of each term, from its own re scan"""
+    return sorted(
+        (key, match.start(), match.end())
+        for term, key in terms
+        for match in re.finditer(rf'\b{re.escape(term)}\b', text, re.IGNORECASE)
+    )
+
+
+def _str_scan(monkeypatch, text: str):
+    """Analyze text with the pattern rules forced onto the str patterns"""
+    monkeypatch.setattr(rule_engine, "_ascii_buffer", lambda text, text_utf8: None)
+    return RuleEngine().analyze(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Governed by the laws of the Cayman Islands and the British Virgin Islands.",
+    "CAYMAN ISLANDS, cayman-islands, Caymanx and xCayman; New Jersey; Bermuda_Ltd.",
+    "Commercially reasonable efforts, reasonable efforts and material terms may apply.",
+    "Schedules to be provided, being finalized, or to be determined.",
+    "The buyer is a caymanés holding company registered in Panamá, not éPanama.",
+    "Registered in the British Virgin Islandsé; “Bermuda” and Jersey law; Panamá.",
+    "Text \ud835 glyph. Laws of the Cayman Islands.",
+    "Laws of the Cayman İslands and ſeychelles.",
+])
+def test_term_backend_matches_per_term_scan(term_backend, text):
+    text_utf8 = text.encode("utf-8", "surrogatepass")
+    for matcher, terms in TERM_LISTS:
+        assert sorted(matcher.spans(text, text.lower(), text_utf8)) == _per_term_spans(terms, text)
+
+
+def test_accented_letter_breaks_term_match(term_backend):
+    text = FILLER + "The buyer is a caymanés holding company."
+    titles = [flag.title for flag in RuleEngine().analyze(text)]
+    assert not any("Cayman" in title for title in titles)
+
+
+def test_lone_surrogate_before_term_hit(term_backend):
+    text = "Text \ud835 glyph. Laws of the Cayman Islands."
+    titles = [flag.title for flag in RuleEngine().analyze(text)]
+    assert any("Cayman" in title for title in titles)
+
+
+@pytest.mark.parametrize("sentence, buffered", [
+    # A non-ASCII digit has no one-byte stand-in, so these stay on str
+    ("The accounts were audited in ١٩٩٥ by a regional firm.", False),
+    ("The accounts were audited in 19٩٥ by a regional firm.", False),
+    ("Representations survive ٥ months after closing.", False),
+    ("Top 5 customers account for 7٣% of revenue.", False),
+    ("The accounts were audited in 2011 by “Big Four” staff.", True),
+    ("Representations survive 6 months after closing.", True),
+    ("Representations survive 6\x1dmonths after closing.", True),
+    ("The ſurvival period is 9 months.", True),
+    ("AUDİTED in 1998.", True),
+    ("Top 5 customers account for “most”, roughly 72% of revenue.", True),
+    ("The earnout — to be determined — remains open.", True),
+    ("Deferred consideration depends on “performance metrics”.", True),
+])
+def test_pattern_backend_matches_str_scan(monkeypatch, pattern_backend, sentence, buffered):
+    text = FILLER + sentence
+    assert (rule_engine._ascii_buffer(text, text.encode()) is not None) == buffered
+    flags = RuleEngine().analyze(text)
+    assert flags == _str_scan(monkeypatch, text)
+
+
+def test_non_ascii_audit_year_is_not_flagged():
+    text = FILLER + "The accounts were audited in ١٩٩٥ by a regional firm."
+    titles = [flag.title for flag in RuleEngine().analyze(text)]
+    assert not any(title.startswith("Outdated Financial Audit") for title in titles)
+
+
+def test_engine_keeps_no_document_copies():
+    engine = RuleEngine()
+    engine.analyze(FILLER + "Governed by the laws of the Cayman Islands.")
+    assert (engine._text_lower, engine._text_utf8, engine._text_ascii) == ("", b"", None)
@@ -17,18 +17,24 @@ async def test_analysis(pdf_path: str):
     
     start_time = time.time()
     
-    # Step 1: Parse PDF
+    # Step 1: Parse PDF (in a worker thread, like the API)
     print("\n[1/4] Parsing PDF...")
     parser = PDFParser()
-    parsed_data = parser.parse(pdf_path)
+    parsed_data = await asyncio.to_thread(parser.parse, pdf_path)
     full_text = parsed_data["full_text"]
     print(f"  → Extracted {len(full_text)} characters from {parsed_data['metadata']['page_count']} pages")
     
-    # Step 2: Rule-based analysis
+    # Steps 2 and 3 run concurrently: the CPU-bound rule checks go to a worker
+    # thread while the LLM calls wait on the network
     print("\n[2/4] Running rule-based checks...")
+    print("\n[3/4] Running LLM analysis (this may take a minute)...")
     rule_engine = RuleEngine()
-    rule_flags = rule_engine.analyze(full_text)
-    print(f"  → Found {len(rule_flags)} rule-based flags")
+    llm_analyzer = LLMAnalyzer()
+    rule_flags, llm_flags = await asyncio.gather(
+        asyncio.to_thread(rule_engine.analyze, full_text),
+        llm_analyzer.analyze(full_text, use_claude=True, use_gpt=True)
+    )
+    print(f"\n  → Found {len(rule_flags)} rule-based flags")
     
     # Print rule flags
     if rule_flags:
@@ -36,11 +42,7 @@ async def test_analysis(pdf_path: str):
         for flag in rule_flags[:5]:  # Show first 5
             print(f"    • [{flag.severity}] {flag.title}")
     
-    # Step 3: LLM analysis
-    print("\n[3/4] Running LLM analysis (this may take a minute)...")
-    llm_analyzer = LLMAnalyzer()
-    llm_flags = await llm_analyzer.analyze(full_text, use_claude=True, use_gpt=True)
-    print(f"  → Found {len(llm_flags)} LLM flags")
+    print(f"\n  → Found {len(llm_flags)} LLM flags")
     
     # Print LLM flags by source
     if llm_flags: